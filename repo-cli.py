@@ -1,12 +1,21 @@
 #!/usr/bin/env python
 
+import functools
+import os
 from pathlib import Path
+import pickle
 import socket
 
 import typer
 import yaml
 
 import docker_wrapper
+from docker_wrapper import docker_helpers
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore
 
 REPO_DIR = Path(__file__).parent.absolute()
 CONFIG_FILE_PATH = REPO_DIR / "example-environment-cfg.yml"
@@ -17,9 +26,37 @@ def get_domain():
     return socket.getfqdn()
 
 
+def cached_config(func):
+    """Cache the parsed config file on disk, keyed by the path, mtime and size of the file"""
+
+    @functools.wraps(func)
+    def wrapper(file_path):
+        stat = os.stat(file_path)
+        key = (os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size)
+        cache_path = docker_helpers.cache_dir() / "env_cfg.pkl"
+        try:
+            with open(cache_path, "rb") as f:
+                cached_key, config_data = pickle.load(f)
+            if cached_key == key:
+                return config_data
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            pass
+        config_data = func(file_path)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                pickle.dump((key, config_data), f)
+        except OSError:
+            pass
+        return config_data
+
+    return wrapper
+
+
+@cached_config
 def read_config_file(file_path):
     with open(file_path, "r") as file:
-        config_data = yaml.safe_load(file)
+        config_data = yaml.load(file, Loader=SafeLoader)
     return config_data
 
 
@@ -27,7 +64,7 @@ if __name__ == "__main__":
 
     all_config_data = read_config_file(CONFIG_FILE_PATH)
 
-    app = typer.Typer()
+    app = typer.Typer(pretty_exceptions_enable=False, rich_markup_mode=None)
 
     # Create a top level command for the repo CLI
     #
@@ -41,7 +78,9 @@ if __name__ == "__main__":
         docker_wrapper.set_env_config(ENV_CONFIG)
 
     app.add_typer(
-        docker_wrapper.create_cli(image_dir="sample-images", env_config_arg=ENV_CONFIG),
+        docker_wrapper.create_cli(
+            image_dir=str(REPO_DIR / "sample-images"), env_config_arg=ENV_CONFIG
+        ),
         name="docker",
     )
 
@@ -5,6 +5,10 @@ from typing import List
 
 import docker_wrapper
 
+_DOCKER_FOLDER = os.path.realpath(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "Docker")
+)
+
 
 class UbuntuBase(docker_wrapper.DockerImage):
     """ubuntu_base docker image
@@ -18,10 +22,7 @@ class UbuntuBase(docker_wrapper.DockerImage):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
         self.name = UbuntuBase.NAME
-        self.docker_folder = os.path.realpath(
-            os.path.join(os.path.realpath(__file__), "../Docker")
-        )
-        print(self.docker_folder)
+        self.docker_folder = _DOCKER_FOLDER
 
     def get_docker_run_args(self) -> List[str]:
         """"""
@@ -5,6 +5,8 @@ Example of a docker image that inherits from another one, in this
 case ubuntu_base
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 import hashlib
 import logging
 import os
@@ -21,6 +23,10 @@ sys.path.append(PARENT_DIRECTORY)
 
 from ubuntu_base import docker_wrapper_extensions as parent_image  # noqa: E402
 
+_DOCKER_FOLDER = os.path.realpath(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "Docker")
+)
+
 
 class UbuntuDerived(docker_wrapper.DockerImage):
     """DockerImage class of the ubuntu_derived image"""
@@ -29,13 +35,11 @@ class UbuntuDerived(docker_wrapper.DockerImage):
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.parent = parent_image.UbuntuBase()
+        self.parent = parent_image.UbuntuBase(fast_hash=self.fast_hash)
         self.name = UbuntuDerived.NAME
-        self.docker_folder = os.path.realpath(
-            os.path.join(os.path.realpath(__file__), "../Docker")
-        )
+        self.docker_folder = _DOCKER_FOLDER
 
-    @property
+    @cached_property
     def image_hash(self) -> str:
         """Compute the hash of the derived image
 
@@ -47,15 +51,25 @@ class UbuntuDerived(docker_wrapper.DockerImage):
         Returns:
             str: Returned hash value
         """
-        parent_image_hash = self.parent.image_hash
+        # The two folders are disjoint, hash them concurrently. The parent hash is
+        # computed in this thread, cached_property locks are shared by all instances
+        # before Python 3.12, so a parent of the same class would wait on this call.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            this_future = pool.submit(self.context_hash, self.docker_folder)
+            parent_image_hash = self.parent.image_hash
+            this_image_hash = this_future.result()
         logging.debug(f"Parent hash: {parent_image_hash}")
-        this_image_hash = self.folder_hash(self.docker_folder)
         logging.debug(f"This image hash {this_image_hash}")
         hash_object = hashlib.sha1(
             parent_image_hash.encode("utf8") + this_image_hash.encode("utf8")
         ).hexdigest()
         return hash_object
 
+    def invalidate_hash(self) -> None:
+        """Drop the memoized hashes of this image and of its parent"""
+        super().invalidate_hash()
+        self.parent.invalidate_hash()
+
     def build_image(self, force_build: bool = False) -> None:
         """Build the image
 
@@ -66,9 +80,11 @@ class UbuntuDerived(docker_wrapper.DockerImage):
             force_build (bool, optional): _description_. Defaults to False.
         """
         image_url = self.image_url
-        if self.image_exists(image_url) and not force_build:
+        if not force_build and self.image_exists(image_url):
             logging.info(f"Image: {image_url} already exists, not rebuilding")
             return
+        # The parent memoizes both its URL and whether it exists, so the checks below
+        # do not hash its Docker folder or query docker again.
         self.parent.build_image()
         parent_url = self.parent.image_url
         cmd = [
@@ -76,11 +92,15 @@ class UbuntuDerived(docker_wrapper.DockerImage):
             "build",
             "--build-arg",
             f"PARENT_IMAGE={parent_url}",
+            *self.build_cache_args(),
             self.docker_folder,
             "-t",
             image_url,
+            "-t",
+            self.latest_url,
         ]
         self._exec_cmd(cmd)
+        self._record_image(image_url)
 
     def get_docker_run_args(self) -> List[str]:
         """"""
@@ -1,26 +1,50 @@
 #!/usr/bin/env python3
 
-"""Command line interface of the Docker Wrapper module
-"""
+"""Command line interface of the Docker Wrapper module"""
 
+import ast
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
-import importlib
-import importlib.util
-import inspect
+import functools
 import logging
 import os
 from pathlib import Path
+import pickle
 import subprocess
+import sys
+import time
+from types import CodeType
 import typing
-from typing import Dict, List, NewType, Optional, Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NewType,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+# docker_helpers is cheap to import (the docker SDK is only loaded on first use) and the
+# package __init__ loads it anyway. Typer, forge and the importlib machinery are
+# imported where they are used, so trivial invocations such as --version skip them.
+from . import docker_helpers
 
-import forge
-import typer
+if TYPE_CHECKING:
+    from importlib.machinery import ModuleSpec
 
-from . import docker_helpers
+    import typer
 
-_LOG_LEVEL_STRINGS = ["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"]
-LOCAL_ENV_CONFIG = {}
+_LOG_LEVEL_STRINGS = frozenset(("CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"))
+LOCAL_ENV_CONFIG: Dict[str, str] = {}
+# Single item list holding LOCAL_ENV_CONFIG, the CLI commands keep a reference to it so
+# they see the configuration set after create_cli() without calling get_env_config()
+_CURRENT_CONFIG: List[Dict[str, str]] = [LOCAL_ENV_CONFIG]
 
 
 class LoggingLevel(str, Enum):
@@ -42,11 +66,32 @@ class LoggingLevel(str, Enum):
     DEBUG = "DEBUG"
 
 
-__WRAPPER_EXTENSIONS: Dict[str, Type[docker_helpers.DockerImage]] = {}
+# Numeric value of each logging level
+_LOG_LEVELS = {
+    LoggingLevel.CRITICAL: logging.CRITICAL,
+    LoggingLevel.ERROR: logging.ERROR,
+    LoggingLevel.WARNING: logging.WARNING,
+    LoggingLevel.INFO: logging.INFO,
+    LoggingLevel.DEBUG: logging.DEBUG,
+}
+
 __DOCKER_IMAGE_CLASS_NAME = "DockerImages"
 
 EnumClassType = NewType("EnumClassType", Enum)
 
+_EXTENSIONS_FILE = "docker_wrapper_extensions.py"
+# On-disk index of the image names each extensions file defines, see _index_extensions()
+_EXTENSIONS_INDEX_FILE = "extensions_index.pkl"
+# Subcommands that never talk to a Docker registry, so no docker login is needed for them
+_LOCAL_COMMANDS = frozenset(("image-url", "shutdown"))
+# Age after which a registry login is assumed to have expired and is done again
+_DOCKER_LOGIN_MAX_AGE = 8 * 60 * 60
+# Time of the last successful docker login per registry host, kept in cache_dir()
+_DOCKER_LOGINS_FILE = "logins.json"
+
+# Classes of the extensions files loaded so far, with the mtime of the file when loaded
+_EXT_MODULE_CACHE: Dict[str, Tuple[int, Dict[str, Type[docker_helpers.DockerImage]]]] = {}
+
 
 def set_env_config(config: Dict[str, str]) -> None:
     """Set the configuration of the repository
@@ -56,6 +101,7 @@ def set_env_config(config: Dict[str, str]) -> None:
     """
     global LOCAL_ENV_CONFIG
     LOCAL_ENV_CONFIG = config
+    _CURRENT_CONFIG[0] = config
 
 
 def get_env_config() -> Dict[str, str]:
@@ -67,9 +113,402 @@ def get_env_config() -> Dict[str, str]:
     return LOCAL_ENV_CONFIG
 
 
+def _registry_host(registry_prefix: str) -> str:
+    """Return the registry host of an images prefix
+
+    Args:
+        registry_prefix (str): Registry prefix of the images, starting with the registry
+            host.
+
+    Returns:
+        str: Registry host, empty if there is no prefix.
+    """
+    return registry_prefix.split("/", 1)[0]
+
+
+def _record_docker_login(registry_prefix: str) -> None:
+    """Record the time of a successful docker login to a registry
+
+    Args:
+        registry_prefix (str): Registry prefix of the images, starting with the registry
+            host.
+    """
+    host = _registry_host(registry_prefix)
+    if not host:
+        return
+    logins_file = docker_helpers.cache_dir() / _DOCKER_LOGINS_FILE
+    logins = docker_helpers._read_json_cache(logins_file)
+    logins[host] = time.time()
+    docker_helpers._write_json_cache(logins_file, logins)
+
+
+def _docker_login_is_fresh(registry_prefix: str) -> bool:
+    """Check if a recent docker login already stored credentials for a registry
+
+    Args:
+        registry_prefix (str): Registry prefix of the images, starting with the registry
+            host.
+
+    Returns:
+        bool: True if the last successful login to the registry host, as recorded by
+            _record_docker_login(), was less than _DOCKER_LOGIN_MAX_AGE seconds ago.
+    """
+    host = _registry_host(registry_prefix)
+    if not host:
+        return False
+    logins = docker_helpers._read_json_cache(docker_helpers.cache_dir() / _DOCKER_LOGINS_FILE)
+    login_time = logins.get(host)
+    if not isinstance(login_time, (int, float)):
+        return False
+    return 0 <= time.time() - login_time <= _DOCKER_LOGIN_MAX_AGE
+
+
+def _find_projects(image_dir: str) -> Iterator[Tuple[str, str]]:
+    """Find the docker image folders under image_dir
+
+    The documented layout is a single level of image folders, each one containing a Docker
+    folder and a docker_wrapper_extensions.py file. So only the direct children of
+    image_dir are checked, using the file type information os.scandir already returns.
+
+    Args:
+        image_dir (str): Folder containing the docker image folders, as a real path. Only
+            the symbolic links among its children are resolved.
+
+    Yields:
+        Iterator[Tuple[str, str]]: Pairs of the image folder and of its extension file path.
+    """
+    try:
+        entries = os.scandir(image_dir)
+    except OSError as e:
+        # Like os.walk, ignore folders that are missing or can not be listed
+        logging.debug(f"Can not scan {image_dir}: {e}")
+        return
+    with entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            # entry.path is image_dir + os.sep + entry.name, already a real path
+            project_dir = os.path.realpath(entry.path) if entry.is_symlink() else entry.path
+            project_prefix = project_dir + os.sep
+            ext_path = project_prefix + _EXTENSIONS_FILE
+            if os.path.isdir(project_prefix + "Docker") and os.path.isfile(ext_path):
+                yield project_dir, ext_path
+
+
+def _image_classes() -> Set[Type[docker_helpers.DockerImage]]:
+    """All the DockerImage subclasses that have been defined, at any depth
+
+    Returns:
+        Set[Type[docker_helpers.DockerImage]]: The subclasses.
+    """
+    classes: Set[Type[docker_helpers.DockerImage]] = set()
+    pending = [docker_helpers.DockerImage]
+    while pending:
+        for sub in pending.pop().__subclasses__():
+            if sub not in classes:
+                classes.add(sub)
+                pending.append(sub)
+    return classes
+
+
+def _extensions_spec(ext_path: str) -> "ModuleSpec":
+    """Module spec of a docker_wrapper_extensions.py file
+
+    Each file gets its own module name, docker_wrapper_extensions_<image folder name>, so
+    that the modules of different images do not replace each other in sys.modules. The
+    name is not dotted, so that pickle can import it back from sys.modules without a
+    parent package.
+
+    Args:
+        ext_path (str): Path of the extensions file.
+
+    Returns:
+        ModuleSpec: Spec to create and load the module with.
+    """
+    import importlib.util
+
+    image_folder = os.path.basename(os.path.dirname(ext_path))
+    return importlib.util.spec_from_file_location(  # type: ignore
+        f"docker_wrapper_extensions_{image_folder}", ext_path
+    )
+
+
+def _read_extensions_code(ext_path: str) -> CodeType:
+    """Read the code object of an extensions file, without executing it
+
+    The loader uses the bytecode cached in __pycache__ when it is up to date and compiles
+    the file otherwise, so this is the file I/O and compile part of an import.
+
+    Args:
+        ext_path (str): Path of the extensions file.
+
+    Returns:
+        CodeType: Code of the module.
+    """
+    spec = _extensions_spec(ext_path)
+    return spec.loader.get_code(spec.name)  # type: ignore
+
+
+def _load_extensions_module(
+    ext_path: str, code: Optional[CodeType] = None
+) -> Dict[str, Type[docker_helpers.DockerImage]]:
+    """Import a docker_wrapper_extensions.py file and collect the DockerImage classes
+    it contains
+
+    The classes of a file are re-used while its mtime does not change, so a file is
+    executed only once per process however many times it is looked up.
+
+    Args:
+        ext_path (str): Path of the extensions file.
+        code (Optional[CodeType], optional): Code of the file, as returned by
+            _read_extensions_code(). Read from the file when not given. Defaults to None.
+
+    Returns:
+        Dict[str, Type[docker_helpers.DockerImage]]: Image names and their classes.
+    """
+    import importlib.util
+
+    mtime = os.stat(ext_path).st_mtime_ns
+    cached = _EXT_MODULE_CACHE.get(ext_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    spec = _extensions_spec(ext_path)
+    mod = importlib.util.module_from_spec(spec)
+    if code is None:
+        code = _read_extensions_code(ext_path)
+    known = _image_classes()
+    # Registered before running it, like the import system does, as code such as
+    # dataclasses looks up the module of the classes it processes in sys.modules
+    sys.modules[spec.name] = mod
+    try:
+        exec(code, mod.__dict__)
+    except BaseException:
+        del sys.modules[spec.name]
+        raise
+    # The classes the module defined are the DockerImage subclasses that did not exist
+    # before it ran, minus those defined by the modules it imported
+    extensions = {
+        sys.intern(cls.NAME): cls
+        for cls in _image_classes() - known
+        if cls.__module__ == mod.__name__
+    }
+    _EXT_MODULE_CACHE[ext_path] = (mtime, extensions)
+    return extensions
+
+
+def _scan_extension_names(ext_path: str) -> List[str]:
+    """Find the image names an extensions file defines, without importing it
+
+    The file is parsed and the literal NAME class attributes of its image classes are
+    collected. Image classes are the ones derived from DockerImage, or from another image
+    class of the same file. Files whose image names can not be found this way, e.g.
+    classes with a NAME derived from a base imported from elsewhere, are imported instead.
+
+    Args:
+        ext_path (str): Path of the extensions file.
+
+    Returns:
+        List[str]: Image names.
+    """
+    with open(ext_path, "rb") as f:
+        tree = ast.parse(f.read(), filename=ext_path)
+    image_classes = {"DockerImage"}
+    names = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ClassDef) or not node.bases:
+            continue
+        name = None
+        for stmt in node.body:
+            if isinstance(stmt, ast.Assign):
+                targets = stmt.targets
+            elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+                targets = [stmt.target]
+            else:
+                continue
+            if (
+                any(isinstance(t, ast.Name) and t.id == "NAME" for t in targets)
+                and isinstance(stmt.value, ast.Constant)
+                and isinstance(stmt.value.value, str)
+            ):
+                name = stmt.value.value
+        bases = {
+            base.id if isinstance(base, ast.Name) else base.attr
+            for base in node.bases
+            if isinstance(base, (ast.Name, ast.Attribute))
+        }
+        if bases & image_classes:
+            image_classes.add(node.name)
+            if name is not None:
+                names.append(name)
+        elif name is not None:
+            # Unknown base, only importing the file tells if this is an image class
+            names = []
+            break
+    if not names:
+        names = list(_load_extensions_module(ext_path))
+    return names
+
+
+def _index_extensions(image_dir: Path, resolved: bool = False) -> Dict[str, str]:
+    """Find the names of all available Docker images, without loading the extension
+    modules
+
+    The image names each extensions file defines are kept in an on-disk index, keyed by
+    the mtime and size of the file. Only new or modified extensions files are parsed, see
+    _scan_extension_names().
+
+    Args:
+        image_dir (Path): Path containing the docker images.
+        resolved (bool, optional): image_dir is already a real path. Defaults to False.
+
+    Returns:
+        Dict[str, str]: Image names mapped to the path of the extensions file defining them.
+    """
+    if not image_dir:
+        return {}
+    # Assume that each folder is a separate docker image and there is no nesting.
+    # Expected that each folder should have a docker_wrapper_extensions.py Python script
+    # and a Docker folder with any necessary files
+    base = str(image_dir) if resolved else os.path.realpath(image_dir)
+    ext_paths = [ext_path for _, ext_path in _find_projects(base)]
+    logging.debug(f"Found docker image extensions: {ext_paths}")
+
+    index_path = docker_helpers.cache_dir() / _EXTENSIONS_INDEX_FILE
+    index: Dict[str, Tuple[int, int, List[str]]] = {}
+    try:
+        with open(index_path, "rb") as f:
+            index = pickle.load(f)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass
+
+    extensions: Dict[str, str] = {}
+    index_changed = False
+    for ext_path in ext_paths:
+        stat = os.stat(ext_path)
+        cached = index.get(ext_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            names = cached[2]
+        else:
+            names = _scan_extension_names(ext_path)
+            index[ext_path] = (stat.st_mtime_ns, stat.st_size, names)
+            index_changed = True
+        # The names are the keys of every image lookup of the CLI, intern them
+        extensions.update((sys.intern(name), ext_path) for name in names)
+
+    if index_changed:
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(index_path, "wb") as f:
+                pickle.dump(index, f)
+        except OSError as e:
+            logging.debug(f"Could not write the extensions index {index_path}: {e}")
+    return extensions
+
+
+def _image_dir_key(
+    image_dir: Optional[Path],
+) -> Optional[Tuple[str, int, Tuple[Tuple[str, int, int], ...]]]:
+    """Key of the in-process caches of an image folder
+
+    Adding, removing or renaming an image folder changes the mtime of image_dir, and
+    editing an extensions file changes its own mtime and size, as checked by the on-disk
+    index. Both are part of the key.
+
+    Args:
+        image_dir (Optional[Path]): Path containing the docker images.
+
+    Returns:
+        Optional[Tuple[str, int, Tuple[Tuple[str, int, int], ...]]]: Real path and mtime
+            of image_dir, and the path, mtime and size of each extensions file under it.
+            None if image_dir can not be read.
+    """
+    if not image_dir:
+        return None
+    try:
+        base = os.path.realpath(image_dir)
+        mtime_ns = os.stat(base).st_mtime_ns
+    except OSError:
+        return None
+    ext_files = []
+    for _, ext_path in _find_projects(base):
+        try:
+            stat = os.stat(ext_path)
+        except OSError:
+            continue
+        ext_files.append((ext_path, stat.st_mtime_ns, stat.st_size))
+    return base, mtime_ns, tuple(ext_files)
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_index(
+    image_dir: str, mtime_ns: int, ext_files: Tuple[Tuple[str, int, int], ...]
+) -> Dict[str, str]:
+    """_index_extensions() memoized per image folder state, see _image_dir_key()"""
+    return _index_extensions(Path(image_dir), resolved=True)
+
+
+def _lookup_extensions(image_dir: Optional[Path]) -> Dict[str, str]:
+    """Return _index_extensions(image_dir), computing it once per process
+
+    create_cli and the main callback both need the image names, usually for the same
+    image folder.
+
+    Args:
+        image_dir (Optional[Path]): Path containing the docker images.
+
+    Returns:
+        Dict[str, str]: Image names mapped to the path of the extensions file defining them.
+    """
+    key = _image_dir_key(image_dir)
+    return _cached_index(*key) if key else {}
+
+
+@dataclass
+class _Registry:
+    """Docker images of a CLI created by create_cli()
+
+    Each CLI has its own registry, so several CLIs can live in the same process.
+
+    Attributes:
+        images (Dict[str, str]): Image names mapped to the extensions file defining them.
+            They are persisted across runs by the extensions index, see _index_extensions().
+        extensions (Dict[str, Type[docker_helpers.DockerImage]]): Classes of the images
+            used so far.
+        fast_hash (bool): Set by the --fast-hash option of the CLI.
+    """
+
+    images: Dict[str, str] = field(default_factory=dict)
+    extensions: Dict[str, Type[docker_helpers.DockerImage]] = field(default_factory=dict)
+    fast_hash: bool = False
+
+    def load(self, image_dir: Optional[Path]) -> None:
+        """Use the images of an image folder
+
+        Args:
+            image_dir (Optional[Path]): Path containing the docker images.
+        """
+        self.images = _lookup_extensions(image_dir)
+        self.extensions = {}
+
+    def resolve(self, image_name: str) -> Optional[Type[docker_helpers.DockerImage]]:
+        """Return the class of an image, importing its extensions file on first use
+
+        Args:
+            image_name (str): Name of the image.
+
+        Returns:
+            Optional[Type[docker_helpers.DockerImage]]: Class of the image, None if unknown.
+        """
+        if image_name not in self.extensions and image_name in self.images:
+            self.extensions.update(_load_extensions_module(self.images[image_name]))
+        return self.extensions.get(image_name)
+
+
 def find_extensions(image_dir: Path) -> Dict[str, Type[docker_helpers.DockerImage]]:
     """Find all available Docker images and extension modules that enable working with them
 
+    The result is memoized per image folder state, see _image_dir_key().
+
     Args:
         image_dir (Path): Path containing the docker images.
 
@@ -77,43 +516,48 @@ def find_extensions(image_dir: Path) -> Dict[str, Type[docker_helpers.DockerImag
         Dict[str, Callable[[], docker_helpers.DockerImage]]: Dictionary of docker image names and
         object constructors we can call.
     """
-    # Find all available docker images under the image_dir folder
-    # Assume that each folder is a separate docker image and there is no nestting
-    # Expected that each folder should have a docker_wrapper_extensions.py Python script
-    # and a Docker folder with ant necessary files
-    if not image_dir:
+    key = _image_dir_key(image_dir)
+    if key is None:
         return {}
-    docker_images = {}
-    for root, dirs, _ in os.walk(os.path.realpath(image_dir), topdown=True):
-        for dir in dirs:
-            if "Docker" == dir:
-                image_name = os.path.basename(root)
-                docker_images[image_name] = os.path.realpath(root)
-    logging.debug(f"Found docker images: {docker_images}")
-    # Load the docker_wrapper_extensions.py, import it as a module and get a callable
-    # object for the DockerImage class object that each file contains
-    extensions = {}
-    for _, ipath in docker_images.items():
-        spec = importlib.util.spec_from_file_location(
-            "docker_wrapper_extensions", os.path.join(ipath, "docker_wrapper_extensions.py")
-        )
-        mod = importlib.util.module_from_spec(spec)  # type: ignore
-        spec.loader.exec_module(mod)  # type: ignore
-        docker_image_classes = []
-        for _, obj in inspect.getmembers(mod):
-            if inspect.isclass(obj) and issubclass(obj, docker_helpers.DockerImage):
-                docker_image_classes.append(obj)
-                # docker_image_classes contains the classes that are of type DockerImage
-                extensions[obj.NAME] = obj
+    return dict(_find_extensions_cached(*key))
 
+
+@functools.lru_cache(maxsize=8)
+def _find_extensions_cached(
+    image_dir: str, mtime_ns: int, ext_files: Tuple[Tuple[str, int, int], ...]
+) -> Dict[str, Type[docker_helpers.DockerImage]]:
+    """Implementation of find_extensions(), memoized per image folder state"""
+    index = _cached_index(image_dir, mtime_ns, ext_files)
+    ext_paths = sorted(set(index.values()))
+    if not ext_paths:
+        return {}
+    # Reading (or compiling) the code of the modules is mostly file I/O, which releases the
+    # GIL, so do it concurrently. The modules are then executed one by one in this thread,
+    # executing them from worker threads would only contend on the import lock. Files
+    # loaded before are not read again, see _load_extensions_module().
+    to_read = [p for p in ext_paths if p not in _EXT_MODULE_CACHE]
+    codes: Dict[str, Optional[CodeType]] = {}
+    if to_read:
+        with ThreadPoolExecutor(max_workers=min(32, len(to_read))) as pool:
+            codes.update(zip(to_read, pool.map(_read_extensions_code, to_read)))
+    loaded = {
+        ext_path: _load_extensions_module(ext_path, codes.get(ext_path)) for ext_path in ext_paths
+    }
+    extensions = {}
+    for image_name, ext_path in index.items():
+        if image_name in loaded[ext_path]:
+            extensions[image_name] = loaded[ext_path][image_name]
     return extensions
 
 
-def __create_image(image_name: str, **kwargs: Dict[str, str]) -> docker_helpers.DockerImage:
+def __create_image(
+    registry: _Registry, image_name: str, **kwargs: Dict[str, str]
+) -> docker_helpers.DockerImage:
     """Instantiate an DockerImage object (or its subclass) for the specified
     Image
 
     Args:
+        registry (_Registry): Images of the CLI.
         image_name (str): Name of the image to create an image for.
         **kwargs (Dict[str, str]): Additional arguments to pass to the DockerImage object.
 
@@ -123,13 +567,19 @@ def __create_image(image_name: str, **kwargs: Dict[str, str]) -> docker_helpers.
     Returns:
         docker_helpers.DockerImage: Docker image object to be used to interact with it.
     """
-    if image_name not in __WRAPPER_EXTENSIONS:
+    image_class = registry.resolve(image_name)
+    if image_class is None:
+        import typer
+
         typer.echo(f"Unknown Image {image_name}")
         raise typer.Exit(1)
-    image = __WRAPPER_EXTENSIONS[image_name](**kwargs)  # type: ignore
+    if registry.fast_hash:
+        kwargs = {**kwargs, "fast_hash": True}  # type: ignore
+    image = image_class(**kwargs)  # type: ignore
     return image
 
 
+@functools.lru_cache(maxsize=64)
 def __get_image_name_value(image_name: Union[str, EnumClassType]) -> str:
     """Get the string value of image_name
 
@@ -139,14 +589,13 @@ def __get_image_name_value(image_name: Union[str, EnumClassType]) -> str:
     Returns:
         str: Actual value
     """
-    if isinstance(image_name, str):
-        return image_name
-    return str(image_name.value)
+    # The image name Enum has str values, plain strings come from the per-image commands
+    return image_name if type(image_name) is str else image_name.value  # type: ignore
 
 
 def create_cli(
     image_dir: Optional[str] = None, env_config_arg: Optional[Dict[str, str]] = None  #
-) -> typer.Typer:
+) -> "typer.Typer":
     """Create the command line interface of the Docker Wrapper
 
     Args:
@@ -159,51 +608,75 @@ def create_cli(
         typer.Typer: Typer class wit the registered command line arguments. See the main()
         function how an object can be instantiated.
     """
-    app = typer.Typer()
+    import forge
+    import typer
+
+    # Plain tracebacks and help text, so that Rich (and Pygments) are not loaded
+    app = typer.Typer(pretty_exceptions_enable=False, rich_markup_mode=None)
 
     # Initialize the environment configuration based on passed argument
     # Yet expect that the environment configuration could be ovewritten
-    # past the creation state. For this reason use the get_env_config() function
-    # to get the configuration at execution of each subcommand.
-    env_config = env_config_arg or {}
-    set_env_config(env_config)
+    # past the creation state. For this reason the subcommands read the configuration
+    # from current_config at execution time.
+    set_env_config(env_config_arg or {})
+    current_config = _CURRENT_CONFIG
 
-    images = {}
+    registry = _Registry()
+    images: List[str] = []
     if image_dir:
-        global __WRAPPER_EXTENSIONS
-        __WRAPPER_EXTENSIONS = find_extensions(Path(image_dir))
-        images = {i: i for i in __WRAPPER_EXTENSIONS.keys()}
+        registry.load(Path(image_dir))
+        images = list(registry.images)
         global __DOCKER_IMAGE_CLASS_NAME
-        image_names = Enum(__DOCKER_IMAGE_CLASS_NAME, images)  # type: ignore
+        # Members are valued by their own name, __get_image_name_value relies on it
+        image_names = Enum(__DOCKER_IMAGE_CLASS_NAME, list(zip(images, images)))  # type: ignore
     else:
         image_names = str  # type: ignore
 
     @app.callback()
     def main(
+        ctx: typer.Context,
         image_dir: Path = typer.Option(image_dir, help="Path where the docker images are located"),
         log_level: LoggingLevel = typer.Option(LoggingLevel.INFO, help="Set logging level"),
+        fast_hash: bool = typer.Option(
+            False,
+            help="Tag images by the hash of their Dockerfile and the files it copies, "
+            + "instead of the hash of the whole Docker folder",
+        ),
     ) -> None:
         """Main command arguments
 
         Args:
+            ctx (typer.Context): Context of the invocation.
             image_dir (Path, optional): Path where images are stored.
                 Defaults to typer.Argument(image_dir).
             log_level (LoggingLevel, optional): Executing logging level. Defaults to
                 typer.Option(LoggingLevel.INFO, help="Set logging level").
+            fast_hash (bool, optional): Hash only the Dockerfile and its inputs. Defaults to
+                False.
         """
         # Configure the logging level of the run
         if log_level not in _LOG_LEVEL_STRINGS:
-            message = "invalid choice: {0} (choose from {1})".format(log_level, _LOG_LEVEL_STRINGS)
+            message = "invalid choice: {0} (choose from {1})".format(
+                log_level, ", ".join(level.value for level in LoggingLevel)
+            )
             typer.echo(message)
             typer.Exit(code=1)
-        log_level_int = getattr(logging, log_level, logging.INFO)
-        # check the logging log_level_choices have not changed from our expected values
-        assert isinstance(log_level_int, int)
-        logging.basicConfig(level=log_level_int)
-        global __WRAPPER_EXTENSIONS
-        __WRAPPER_EXTENSIONS = find_extensions(image_dir)
-
-        docker_login_cmd = get_env_config().get("docker_login_command", "")
+        logging.basicConfig(level=_LOG_LEVELS.get(log_level, logging.INFO))
+        registry.fast_hash = fast_hash
+        # Index the images of the --image-dir folder only when a command will use them,
+        # the folder given to create_cli has already been indexed above
+        if ctx.invoked_subcommand is not None:
+            registry.load(image_dir)
+
+        env_config = current_config[0]
+        docker_login_cmd = env_config.get("docker_login_command", "")
+        registry_prefix = env_config.get("docker_registry_prefix", "")
+        if (
+            ctx.invoked_subcommand is None
+            or ctx.invoked_subcommand in _LOCAL_COMMANDS
+            or _docker_login_is_fresh(registry_prefix)
+        ):
+            docker_login_cmd = ""
 
         if docker_login_cmd:
             try:
@@ -216,11 +689,13 @@ def create_cli(
                 else:
                     logging.info("Executing docker login command (redacted for safety)")
 
-                # Capture and log the output of the command
+                # Capture and log the output of the command. The command is run through
+                # the shell since it is usually a pipeline feeding a token to docker login
                 result = subprocess.run(
                     docker_login_cmd, shell=True, check=True, text=True, capture_output=True
                 )
                 logging.info(f"Docker login output: {result.stdout}")
+                _record_docker_login(registry_prefix)
             except subprocess.CalledProcessError as e:
                 logging.warning(f"Docker login failed with error: {e}")
                 if e.stderr:
@@ -230,15 +705,20 @@ def create_cli(
     @app.command()
     def build(
         image_name: image_names,
+        force_build: bool = typer.Option(
+            False, help="Build the image even if it exists, or is recorded as built"
+        ),
     ) -> None:
         """Build a docker image
 
         Args:
             image_name (image_names): Name of the image to build
+            force_build (bool): Build the image even if it exists
         """
-        env_config = get_env_config()
-        image = __create_image(__get_image_name_value(image_name), **env_config)  # type: ignore
-        image.build_image()
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
+        )
+        image.build_image(force_build=force_build)
 
     @app.command()
     def push(
@@ -249,8 +729,9 @@ def create_cli(
         Args:
             image_name (image_names): Name of the image to push
         """
-        env_config = get_env_config()
-        image = __create_image(__get_image_name_value(image_name), **env_config)  # type: ignore
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
+        )
         image.push()
 
     @app.command()
@@ -262,8 +743,9 @@ def create_cli(
         Args:
             image_name (image_names): Name of the image to pull
         """
-        env_config = get_env_config()
-        image = __create_image(__get_image_name_value(image_name), **env_config)  # type: ignore
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
+        )
         image.pull()
 
     @app.command()
@@ -275,8 +757,9 @@ def create_cli(
         Args:
             image_name (image_names): Name of the image to pull
         """
-        env_config = get_env_config()
-        image = __create_image(__get_image_name_value(image_name), **env_config)  # type: ignore
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
+        )
         print(image.image_url)
 
     def _start_docker_helper(
@@ -296,12 +779,18 @@ def create_cli(
             help="Mount the host passwd related files inside the container and use the "
             + "`-u` docker option",
         ),
+        batch: bool = typer.Option(
+            False,
+            help="Run inside a long-lived container that later batch runs reuse, "
+            + "stop it with the shutdown command",
+        ),
     ) -> None:
         """
         Helper function that start a container and drop the user inside a prompt or run a command
         """
-        env_config = get_env_config()
-        image = __create_image(__get_image_name_value(image_name), **env_config)  # type: ignore
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
+        )
         image.run(
             prompt=prompt,
             cmds=cmds,
@@ -314,7 +803,24 @@ def create_cli(
             envs=env,
             enable_sudo=sudo,
             mount_host_passwd=mount_host_passwd,
+            batch=batch,
+        )
+
+    @app.command()
+    def shutdown(
+        image_name: image_names,
+        project_dir: Path = typer.Option(".", help="Path of the repo top-level"),
+    ) -> None:
+        """Stop the batch mode container of an image
+
+        Args:
+            image_name (image_names): Name of the image
+            project_dir (Path): Project the container was started for
+        """
+        image = __create_image(
+            registry, __get_image_name_value(image_name), **current_config[0]  # type: ignore
         )
+        image.shutdown(project_dir)
 
     @typing.no_type_check
     @app.command()
@@ -337,27 +843,37 @@ def create_cli(
         """Run the following command inside the container"""
         _start_docker_helper(False, *args, **kwargs)
 
-    for name in images.keys():
+    # The signature revision is identical for all images, build it once and apply it to
+    # each per-image command instead of re-composing it per image.
+    run_image_revision = forge.compose(  #
+        forge.copy(_start_docker_helper),  #
+        forge.delete("prompt"),  #
+        forge.delete("image_name"),
+    )
+
+    def _make_run_image(iname: str) -> Callable[..., None]:
+        """Create the command running a command inside the iname image"""
 
         @typing.no_type_check
-        @app.command(name)
-        @forge.compose(  #
-            forge.copy(_start_docker_helper),  #
-            forge.delete("prompt"),  #
-            forge.delete("image_name"),
-        )
-        def run_image(
-            iname: str = name,
-            *args,
-            **kwargs,
-        ) -> None:
+        @run_image_revision
+        def run_image(*args, **kwargs) -> None:
             _start_docker_helper(False, image_name=iname, *args, **kwargs)  # noqa: B026
 
+        return run_image  # type: ignore
+
+    for name in images:
+        app.command(name)(_make_run_image(name))
+
     return app
 
 
 def main() -> None:
     """Helper main function"""
+    if len(sys.argv) == 2 and sys.argv[1] in ("--version", "-V"):
+        from . import __version__
+
+        print(__version__)
+        return
     app = create_cli()
     app()
 
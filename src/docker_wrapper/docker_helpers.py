@@ -1,14 +1,478 @@
 #!/usr/bin/env python3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 import getpass
+import glob
+import hashlib
+from itertools import chain
+import json
 import logging
+import mmap
 import os
 from pathlib import Path
+import re
+import shlex
 import subprocess
 import sys
-from typing import List, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 
-import checksumdir
-import docker
+if TYPE_CHECKING:
+    import docker
+
+# Cache of _local_image_set()
+_LOCAL_IMAGES: Optional[Set[str]] = None
+
+# Files larger than this are streamed (or memory mapped) for hashing instead of read at once
+_MMAP_THRESHOLD = 64 * 1024
+
+# COPY / ADD instructions of a Dockerfile, with line continuations already joined
+_COPY_ADD_RE = re.compile(r"^\s*(?:COPY|ADD)\s+(.*)$", re.IGNORECASE | re.MULTILINE)
+
+# Folder trees modified this recently are not cached, as a later edit may land
+# within the same mtime tick and go unnoticed.
+_RACY_MTIME_WINDOW_NS = 2 * 10**9
+
+# Folder hash cache of _cached_image_hash() under cache_dir(), and the lock serializing
+# its updates between the threads of the process
+_HASH_CACHE_FILE = "hashes.json"
+_HASH_CACHE_LOCK = threading.Lock()
+
+# Versioned images built or pulled on this host, under cache_dir(), and its lock
+_BUILT_IMAGES_FILE = "built.json"
+_BUILT_IMAGES_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _host_user() -> Tuple[int, int, str, str]:
+    """Identity of the host user, which does not change during the lifetime of the process
+
+    Looked up on first use, so that importing the module does not query the user database.
+
+    Returns:
+        Tuple[int, int, str, str]: uid, gid, user name and home folder
+    """
+    return os.getuid(), os.getgid(), getpass.getuser(), os.path.expanduser("~")
+
+
+def cache_dir() -> Path:
+    """Return the folder where docker_wrapper keeps its local caches
+
+    Honors $XDG_CACHE_HOME and defaults to ~/.cache/docker_wrapper.
+
+    Returns:
+        Path: Path of the cache folder, it might not exist yet.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "docker_wrapper"
+
+
+def _image_exists_fast(image_ref: str) -> bool:
+    """Check if an image exists locally through the docker CLI
+
+    This avoids loading the docker SDK and connecting a client to the daemon just
+    to answer this question.
+
+    Args:
+        image_ref (str): Full URL:TAG name of the image
+
+    Returns:
+        bool: True iff the image exists locally
+    """
+    try:
+        ret = subprocess.call(
+            ["docker", "image", "inspect", "-f", ".", image_ref],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError:
+        # The docker CLI is not available
+        return False
+    return ret == 0
+
+
+def _normalize_image_name(name: str) -> Optional[str]:
+    """Return the fully qualified form of a REPOSITORY[:TAG] image name
+
+    Docker accepts and lists the same image under several names, e.g. ubuntu,
+    ubuntu:latest and docker.io/library/ubuntu:latest. All of them are mapped to the
+    last form.
+
+    Args:
+        name (str): Image name
+
+    Returns:
+        Optional[str]: Fully qualified REGISTRY/REPOSITORY:TAG name, None for names that
+            can not be normalized, such as digest references or untagged images.
+    """
+    if not name or "@" in name or "<none>" in name:
+        return None
+    repository, _, tag = name.rpartition(":")
+    if not repository or "/" in tag:
+        # No tag, the colon (if any) is the port of the registry
+        repository, tag = name, "latest"
+    domain, _, remainder = repository.partition("/")
+    if not remainder or not ("." in domain or ":" in domain or domain == "localhost"):
+        # No registry, the image comes from Docker Hub
+        domain, remainder = "docker.io", repository
+    if domain == "index.docker.io":
+        domain = "docker.io"
+    if domain == "docker.io" and "/" not in remainder:
+        remainder = f"library/{remainder}"
+    return f"{domain}/{remainder}:{tag}"
+
+
+def _container_running(name: str) -> bool:
+    """Check if a container is running
+
+    Args:
+        name (str): Name of the container
+
+    Returns:
+        bool: True iff the container exists and is running
+    """
+    try:
+        out = subprocess.run(
+            ["docker", "container", "inspect", "-f", "{{.State.Running}}", name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).stdout
+    except OSError:
+        return False
+    return out.strip() == "true"
+
+
+def _local_image_set() -> Set[str]:
+    """Return the REPOSITORY:TAG names of all local images, normalized with
+    _normalize_image_name()
+
+    The list is queried with a single docker CLI call and cached for the lifetime of the
+    process, and images built or pulled by this process are added to it, see
+    _add_local_image().
+
+    Returns:
+        Set[str]: Names of the local images, empty if the docker CLI is not available.
+    """
+    global _LOCAL_IMAGES
+    if _LOCAL_IMAGES is None:
+        try:
+            out = subprocess.check_output(
+                ["docker", "images", "--format", "{{.Repository}}:{{.Tag}}"],
+                stderr=subprocess.DEVNULL,
+            )
+            names = (_normalize_image_name(name) for name in out.decode().splitlines())
+            _LOCAL_IMAGES = {name for name in names if name}
+        except (OSError, subprocess.CalledProcessError):
+            _LOCAL_IMAGES = set()
+    return _LOCAL_IMAGES
+
+
+def _add_local_image(url: str) -> None:
+    """Add an image to the cached list of local images, e.g. after building or pulling it
+
+    Args:
+        url (str): REPOSITORY:TAG name of the image
+    """
+    name = _normalize_image_name(url)
+    if _LOCAL_IMAGES is not None and name:
+        _LOCAL_IMAGES.add(name)
+
+
+def _folder_entries(path: str, prefix: str = "") -> List[Tuple[str, int, int]]:
+    """Collect the relative path, mtime and size of every entry of a folder tree
+    using a single os.scandir pass per folder.
+
+    Args:
+        path (str): Folder to scan.
+        prefix (str, optional): Relative path of path, prepended to the entry names.
+            Defaults to "".
+
+    Returns:
+        List[Tuple[str, int, int]]: (relative path, mtime in ns, size in bytes) of the
+            entries, folders included. Symbolic links to files are described by their
+            target.
+    """
+    found = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            relpath = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                found.append((relpath, stat.st_mtime_ns, stat.st_size))
+                found.extend(_folder_entries(entry.path, relpath + "/"))
+                continue
+            try:
+                # _fast_dirhash() hashes the targets of symbolic links, so use their
+                # metadata too
+                stat = entry.stat()
+            except OSError:
+                # Dangling link
+                stat = entry.stat(follow_symlinks=False)
+            found.append((relpath, stat.st_mtime_ns, stat.st_size))
+    return found
+
+
+def _folder_fingerprint(path: str) -> Tuple[str, int]:
+    """Cheap fingerprint of the state of a folder tree, based on file metadata only
+
+    Args:
+        path (str): Folder to fingerprint.
+
+    Returns:
+        Tuple[str, int]: SHA-1 of the sorted (relative path, mtime, size) of all the
+            entries of the folder, and the latest mtime in the tree in ns.
+    """
+    entries = _folder_entries(path)
+    entries.sort()
+    max_mtime = os.stat(path).st_mtime_ns
+    fingerprint = hashlib.sha1()
+    for relpath, mtime, size in entries:
+        max_mtime = max(max_mtime, mtime)
+        fingerprint.update(f"{relpath}\0{mtime}\0{size}\n".encode("utf8", "surrogateescape"))
+    return fingerprint.hexdigest(), max_mtime
+
+
+def _list_files(path: str) -> List[str]:
+    """List recursively all files under a folder, without following symbolic links
+    to folders.
+
+    Args:
+        path (str): Folder to scan.
+
+    Returns:
+        List[str]: Paths of the files found.
+    """
+    files = []
+    # Iterative walk, deep build contexts do not grow the Python stack
+    pending = deque((path,))
+    while pending:
+        with os.scandir(pending.popleft()) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    files.append(entry.path)
+                elif not entry.is_symlink():
+                    pending.append(entry.path)
+    return files
+
+
+def _file_hash(path: str) -> str:
+    """Compute the SHA-1 hash of the contents of a file.
+
+    Args:
+        path (str): File to hash.
+
+    Returns:
+        str: Hex digest of the file contents, the digest of no data for dangling links.
+    """
+    hasher = hashlib.sha1()
+    if not os.path.exists(path):
+        return hasher.hexdigest()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= _MMAP_THRESHOLD:
+            hasher.update(f.read())
+        elif hasattr(hashlib, "file_digest"):
+            # Python 3.11+, streams the file through hashlib without a Python level loop
+            hasher = hashlib.file_digest(f, "sha1")
+        else:
+            # Hash straight from the page cache, without copying the file to the heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm)
+    return hasher.hexdigest()
+
+
+def _fast_dirhash(path: str) -> str:
+    """Compute the hash of the contents of a folder, hashing files in parallel.
+
+    hashlib releases the GIL while hashing, so the per-file hashes are computed on a
+    thread pool. The result is the SHA-1 of the sorted per-file hex digests, the same
+    value checksumdir.dirhash(path, "sha1") returns, to keep existing image tags stable.
+
+    Args:
+        path (str): Folder to hash.
+
+    Returns:
+        str: Hex digest of the contents of the folder.
+    """
+    files = _list_files(path)
+    if len(files) > 1:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            digests = list(pool.map(_file_hash, files))
+    else:
+        digests = [_file_hash(f) for f in files]
+    hasher = hashlib.sha1()
+    for digest in sorted(digests):
+        hasher.update(digest.encode("utf8"))
+    return hasher.hexdigest()
+
+
+def _dockerfile_inputs(docker_path: str) -> Optional[List[str]]:
+    """Find the files of the build context that the Dockerfile uses
+
+    These are the Dockerfile itself and the sources of its COPY and ADD instructions.
+
+    Args:
+        docker_path (str): Docker folder containing the Dockerfile.
+
+    Returns:
+        Optional[List[str]]: Paths of the files, None if they could not be determined, e.g.
+            for remote ADD sources, heredocs, sources using build arguments or sources
+            outside of the build context.
+    """
+    dockerfile = os.path.join(docker_path, "Dockerfile")
+    try:
+        with open(dockerfile, "r") as f:
+            text = re.sub(r"\\[ \t]*\r?\n", " ", f.read())
+    except OSError:
+        return None
+    inputs = {dockerfile}
+    context = os.path.join(os.path.normpath(docker_path), "")
+    for match in _COPY_ADD_RE.finditer(text):
+        args = match.group(1).strip()
+        try:
+            parts = json.loads(args) if args.startswith("[") else shlex.split(args)
+        except ValueError:
+            return None
+        if any(p.startswith("--from") for p in parts):
+            # Copies from another build stage or image, not from the build context
+            continue
+        sources = [p for p in parts if not p.startswith("--")][:-1]
+        if not sources:
+            return None
+        for source in sources:
+            if "://" in source or "$" in source or source.startswith(("<<", "git@")):
+                return None
+            # Sources are relative to the build context, even when absolute
+            pattern = os.path.normpath(os.path.join(docker_path, source.lstrip("/")))
+            if not pattern.startswith(context):
+                return None
+            matches = glob.glob(pattern)
+            if not matches:
+                return None
+            for path in matches:
+                if os.path.isdir(path):
+                    inputs.update(_list_files(path))
+                else:
+                    inputs.add(path)
+    return sorted(inputs)
+
+
+def dockerfile_hash(docker_path: str) -> Optional[str]:
+    """Compute the hash of the Dockerfile of a Docker folder and of the files it copies
+
+    This is cheaper than hashing the whole folder when the folder contains files that
+    are not part of the image.
+
+    Args:
+        docker_path (str): Docker folder containing the Dockerfile.
+
+    Returns:
+        Optional[str]: Hex digest, None if the inputs of the Dockerfile could not be determined.
+    """
+    inputs = _dockerfile_inputs(docker_path)
+    if inputs is None:
+        return None
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        digests = list(pool.map(_file_hash, inputs))
+    hasher = hashlib.sha1()
+    for path, digest in zip(inputs, digests):
+        hasher.update(os.path.relpath(path, docker_path).encode("utf8"))
+        hasher.update(digest.encode("utf8"))
+    return hasher.hexdigest()
+
+
+def _cached_image_hash(path: str) -> str:
+    """Return the SHA-1 hash of the contents of a folder, re-using a previously
+    computed value if no file in the folder has changed since.
+
+    The cached values of all folders live in cache_dir()/hashes.json, keyed by the
+    folder path and by the fingerprint of its file metadata, see _folder_fingerprint().
+
+    Args:
+        path (str): Folder to hash.
+
+    Returns:
+        str: Hash of the contents of the folder.
+    """
+    path = os.path.realpath(path)
+    fingerprint, max_mtime = _folder_fingerprint(path)
+    cache_file = cache_dir() / _HASH_CACHE_FILE
+    with _HASH_CACHE_LOCK:
+        cached = _read_json_cache(cache_file).get(path)
+    if isinstance(cached, list) and cached[:1] == [fingerprint]:
+        return str(cached[1])
+
+    digest = _fast_dirhash(path)
+    if time.time_ns() - max_mtime < _RACY_MTIME_WINDOW_NS:
+        return digest
+    with _HASH_CACHE_LOCK:
+        # Re-read the cache, another image may have been hashed in the meantime
+        hashes = _read_json_cache(cache_file)
+        hashes[path] = [fingerprint, digest]
+        _write_json_cache(cache_file, hashes)
+    return digest
+
+
+def _read_json_cache(cache_file: Path) -> Dict[str, Any]:
+    """Read a JSON object cache file
+
+    Args:
+        cache_file (Path): Path of the cache.
+
+    Returns:
+        Dict[str, Any]: Contents of the cache, empty if it is missing or unreadable.
+    """
+    try:
+        with open(cache_file, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json_cache(cache_file: Path, data: Dict[str, Any]) -> None:
+    """Write a JSON object cache file, errors are only logged
+
+    Args:
+        cache_file (Path): Path of the cache.
+        data (Dict[str, Any]): Contents of the cache.
+    """
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so that concurrent runs never read a
+        # partially written cache
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.debug(f"Could not write cache {cache_file}: {e}")
+
+
+def _built_images() -> Dict[str, Any]:
+    """Return the versioned images this host built or pulled, see DockerImage.build_image()
+
+    Returns:
+        Dict[str, Any]: Image URLs, mapped to True.
+    """
+    with _BUILT_IMAGES_LOCK:
+        return _read_json_cache(cache_dir() / _BUILT_IMAGES_FILE)
+
+
+def _record_built_image(url: str) -> None:
+    """Add a versioned image to the images this host built or pulled
+
+    Args:
+        url (str): Full URL:TAG name of the image
+    """
+    cache_file = cache_dir() / _BUILT_IMAGES_FILE
+    with _BUILT_IMAGES_LOCK:
+        built = _read_json_cache(cache_file)
+        if url not in built:
+            built[url] = True
+            _write_json_cache(cache_file, built)
 
 
 class DockerImage:
@@ -18,29 +482,57 @@ class DockerImage:
 
     NAME = "UNDEFINED"
 
-    def __init__(self, docker_registry_prefix: str = "", **kwargs: int) -> None:
+    # Properties computed once per object, dropped by invalidate_hash()
+    _MEMOIZED = ("image_hash", "image_tag", "tagged_name", "image_url")
+
+    def __init__(
+        self, docker_registry_prefix: str = "", fast_hash: bool = False, **kwargs: int
+    ) -> None:
         """Initialize the DockerImage object.
 
         Args:
             docker_registry_prefix (str, optional): The prefix of the Docker registry URL.
                 Defaults to "".
+            fast_hash (bool, optional): Hash only the Dockerfile and the files it copies
+                instead of the whole Docker folder, see context_hash(). Defaults to False.
             **kwargs: Additional keyword arguments.
         """
-        self.docker_client = docker.from_env()
         self.name = "UNDEFINED"
         self.docker_folder = ""
         self.version = ""
         self.repo_url = docker_registry_prefix or None
+        self.fast_hash = fast_hash
+        # Memoized answers of image_exists(), keyed by image URL
+        self._image_present: Dict[str, bool] = {}
+
+    @cached_property
+    def docker_client(self) -> "docker.DockerClient":
+        """Return a docker SDK client, connected to the daemon on first use.
+
+        The docker SDK is only imported here, so commands that do not need it do not
+        pay for loading it.
+
+        Returns:
+            docker.DockerClient: Client object
+        """
+        import docker
+
+        return docker.from_env()
 
     @staticmethod
-    def _exec_cmd(cmd: List[str]) -> None:
+    def _exec_cmd(cmd: List[str], quiet: bool = False) -> None:
         """Helper function to execute a shell command, and log it it as well
 
         Args:
             cmd (List[str]): The command and its arguments in a list format.
+            quiet (bool, optional): Discard the standard output of the command.
+                Defaults to False.
         """
-        logging.info(" ".join(cmd))
-        subprocess.check_call(cmd, stdout=sys.stdout, stderr=sys.stderr)
+        # Quote the arguments, so that the logged command can be run as is
+        logging.info(shlex.join(cmd))
+        subprocess.check_call(
+            cmd, stdout=subprocess.DEVNULL if quiet else sys.stdout, stderr=sys.stderr
+        )
 
     @staticmethod
     def folder_hash(docker_path: str) -> str:
@@ -54,18 +546,46 @@ class DockerImage:
         Returns:
             str: Return the hash of the contents of the Docker folder.
         """
-        return checksumdir.dirhash(docker_path, "sha1")
+        return _cached_image_hash(docker_path)
 
-    @property
+    def context_hash(self, docker_path: str) -> str:
+        """Compute the hash of a Docker folder, as used for the image tag
+
+        In fast_hash mode only the Dockerfile and the files that its COPY / ADD instructions
+        use are hashed. If these can not be determined, fall back to hashing the whole folder.
+
+        Args:
+            docker_path (str): Path of the Docker folder.
+
+        Returns:
+            str: Return the hash of the Docker folder.
+        """
+        if self.fast_hash:
+            digest = dockerfile_hash(docker_path)
+            if digest is not None:
+                return digest
+            logging.debug(f"Can not find the inputs of the Dockerfile in {docker_path}")
+        return self.folder_hash(docker_path)
+
+    @cached_property
     def image_hash(self) -> str:
         """Return the full hash of the image
 
+        The hash is computed on first access and re-used afterwards, see invalidate_hash().
+
         Returns:
             str: Hash value.
         """
-        return self.folder_hash(self.docker_folder)
+        return self.context_hash(self.docker_folder)
 
-    @property
+    def invalidate_hash(self) -> None:
+        """Drop the memoized image hash, tag and URL, so that they are computed again
+        on next access, e.g. after the contents of the Docker folder changed.
+        """
+        for attr in self._MEMOIZED:
+            self.__dict__.pop(attr, None)
+
+    @cached_property
     def image_tag(self) -> str:
         """Return the tag of the image
 
@@ -79,7 +599,7 @@ class DockerImage:
             return self.version
         return self.image_hash[:10]
 
-    @property
+    @cached_property
     def tagged_name(self) -> str:
         """Return the tuple <IMAGE_NAME>:<IMAGE_TAG>
 
@@ -88,7 +608,7 @@ class DockerImage:
         """
         return f"{self.name}:{self.image_tag}"
 
-    @property
+    @cached_property
     def image_url(self) -> str:
         """Return the full image URL, that is the
             <REPO_URL>/<IMAGE_NAME>:<IMAGE_TAG>
@@ -100,6 +620,38 @@ class DockerImage:
             return self.tagged_name
         return f"{self.repo_url}/{self.tagged_name}"
 
+    @property
+    def latest_url(self) -> str:
+        """Return the URL of the latest build of the image, that is the
+            <REPO_URL>/<IMAGE_NAME>:latest
+
+        Returns:
+            str: String result
+        """
+        if not self.repo_url:
+            return f"{self.name}:latest"
+        return f"{self.repo_url}/{self.name}:latest"
+
+    def build_cache_args(self) -> List[str]:
+        """Return the docker build arguments that re-use the layers of the latest build
+
+        When the image is hosted in a registry, the latest build is pulled first, so that
+        builds on hosts without a warm layer cache (e.g. CI runners) can re-use its layers.
+        Failing to pull it is not an error.
+
+        Returns:
+            List[str]: Arguments to add to the docker build command.
+        """
+        if not self.repo_url:
+            return []
+        latest_url = self.latest_url
+        logging.info(f"Pulling {latest_url} to seed the build cache")
+        subprocess.call(
+            ["docker", "pull", latest_url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        # Inline cache metadata lets BuildKit re-use the layers of a pulled image
+        return ["--build-arg", "BUILDKIT_INLINE_CACHE=1", "--cache-from", latest_url]
+
     def build_image(self, force_build: bool = False) -> None:
         """Build the Docker image if a specific version does not
         already exist.
@@ -109,36 +661,121 @@ class DockerImage:
                 . Defaults to False.
         """
         image_url = self.image_url
-        if self.image_exists(image_url) and not force_build:
+        if not force_build and self.version and image_url in _built_images():
+            # The version of a versioned image does not change with its contents, once
+            # built or pulled here it is not built again, unless forced
+            logging.info(f"Image: {image_url} already built, not rebuilding")
+            return
+        if not force_build and self.image_exists(image_url):
             logging.info(f"Image: {image_url} already exists, not rebuilding")
             return
-        cmd = ["docker", "build", self.docker_folder, "-t", image_url]
+        cmd = ["docker", "build", *self.build_cache_args(), self.docker_folder]
+        cmd.extend(("-t", image_url, "-t", self.latest_url))
         self._exec_cmd(cmd)
+        self._record_image(image_url)
 
     def pull(self) -> None:
         """Pull the image from the registry."""
         cmd = ["docker", "pull", self.image_url]
         self._exec_cmd(cmd)
+        self._record_image(self.image_url)
 
     def push(self) -> None:
-        """Push the image to the registry"""
+        """Push the image to the registry, and update the latest tag to point to it"""
         cmd = ["docker", "push", self.image_url]
         self._exec_cmd(cmd)
+        latest_url = self.latest_url
+        self._exec_cmd(["docker", "tag", self.image_url, latest_url])
+        self._exec_cmd(["docker", "push", latest_url])
+
+    def _record_image(self, url: str) -> None:
+        """Record that an image now exists locally, after building or pulling it
+
+        Args:
+            url (str): Full URL:TAG name of the image
+        """
+        _add_local_image(url)
+        self._image_present[url] = True
+        if self.version and url == self.image_url:
+            _record_built_image(url)
 
     def image_exists(self, url: str) -> bool:
         """Return true if a docker image exists locally.
 
+        All local images are listed with a single docker call shared by all objects, and
+        the answer is memoized per object, as run() and build_image() both check for the
+        same image. Both sides are compared in their normalized form, and only names
+        that can not be normalized, such as digest references, are checked with docker
+        image inspect.
+
         Args:
             url (str): Full URL:TAG name of the image
 
         Returns:
             bool: True iff the image exists locally
         """
-        try:
-            self.docker_client.images.get(url)
-            return True
-        except docker.errors.ImageNotFound:
-            return False
+        if url not in self._image_present:
+            name = _normalize_image_name(url)
+            if name is None:
+                self._image_present[url] = _image_exists_fast(url)
+            else:
+                self._image_present[url] = name in _local_image_set()
+        return self._image_present[url]
+
+    def batch_container_name(self, project_dir: Path) -> str:
+        """Return the name of the long-lived container used in batch mode
+
+        There is one batch container per image version and project folder.
+
+        Args:
+            project_dir (Path): Project folder mounted inside the container.
+
+        Returns:
+            str: Container name
+        """
+        project_realpath = os.path.realpath(project_dir)
+        project_hash = hashlib.sha1(project_realpath.encode("utf8")).hexdigest()[:10]
+        return f"dw-{self.name}-{self.image_tag}-{project_hash}"
+
+    def shutdown(self, project_dir: Path) -> None:
+        """Stop and remove the batch mode container of a project, if running
+
+        Args:
+            project_dir (Path): Project folder the container was started for.
+        """
+        container = self.batch_container_name(project_dir)
+        if not _container_running(container):
+            logging.info(f"No batch container {container} running")
+            return
+        self._exec_cmd(["docker", "rm", "-f", container], quiet=True)
+
+    def _exec_in_container(
+        self,
+        container: str,
+        project_realpath: str,
+        prompt: bool,
+        cmds: Optional[List[str]],
+        envs: Optional[List[str]],
+    ) -> None:
+        """Run a command or a prompt inside an already running batch container
+
+        Args:
+            container (str): Name of the container.
+            project_realpath (str): Project folder, used as the working directory.
+            prompt (bool): Iff true start an interactive prompt.
+            cmds (Optional[List[str]]): List of commands to run inside the container.
+            envs (Optional[List[str]]): Environment variables to pass.
+        """
+        cmd = ["docker", "exec", "-w", project_realpath]
+        if prompt:
+            cmd.extend(("-t", "-i"))
+        cmd.extend(chain.from_iterable(("-e", env) for env in envs or ()))
+        cmd.append(container)
+        if prompt:
+            cmd.append("bash")
+        else:
+            cmd.extend(("bash", "-c", " ".join(cmds or [])))
+        self._exec_cmd(cmd)
 
     def get_docker_run_args(self) -> List[str]:
         """Return the list of additional arguments to pass to the docker run command
@@ -162,6 +799,7 @@ class DockerImage:
         envs: Optional[List[str]] = None,
         enable_sudo: bool = False,
         mount_host_passwd: bool = True,
+        batch: bool = False,
     ) -> None:
         """Run a container from the Docker Image
 
@@ -184,79 +822,88 @@ class DockerImage:
                 option mounts the sudoers file inside the container.
             mount_host_passwd (bool, optional): Mount the host passwd related files inside the
                 container and make use of the `-u` Docker option to map the user to the host user.
+            batch (bool, optional): Run inside a long-lived container that is reused by later
+                batch runs of the same image and project, see shutdown(). Commands are started
+                with `docker exec` and bypass the image entrypoint. The container options are
+                the ones of the run that started it. Defaults to False.
         """
         if not (bool(prompt) ^ bool(cmds)):
             raise RuntimeError("Either or neither prompt or cmds are set, only one could be set")
+        project_realpath = os.path.realpath(project_dir)
+        container = ""
+        if batch:
+            container = self.batch_container_name(project_dir)
+            if _container_running(container):
+                self._exec_in_container(container, project_realpath, prompt, cmds, envs)
+                return
         image_url = self.image_url
         logging.debug(f"Using Image: {image_url}")
         if not self.image_exists(image_url):
             logging.debug(f"Image {image_url} does not exist")
-            self.build_image()
-        uid = os.getuid()
-        gid = os.getgid()
-        username = getpass.getuser()
-        logging.debug("uid:{}, gid:{}, username:{}".format(uid, gid, username))
-        home_dir = os.path.expanduser("~")
-        cmd = ["docker"]
-        cmd += ["run", "--rm", "--hostname=Docker"]
-        project_realpath = os.path.realpath(project_dir)
+            # The image may have been removed since it was recorded as built
+            self.build_image(force_build=True)
+        uid, gid, username, home = _host_user()
+        logging.debug(f"uid:{uid}, gid:{gid}, username:{username}")
+        cmd = ["docker", "run", "--rm", "--hostname=Docker"]
+        # Bound methods, the argument list is built with many small additions
+        add = cmd.extend
+        append = cmd.append
+        if batch:
+            add(("-d", "--name", container))
         if privileged:
-            cmd += ["--privileged"]
+            append("--privileged")
         if enable_gui:
-            cmd += [
-                "-e",
-                "DISPLAY=$DISPLAY",
-                "-v",
-                "/tmp/.X11-unix:/tmp/.X11-unix",
-            ]
-        if volumes:
-            for v in volumes:
-                cmd += ["-v", v]
+            add(
+                (
+                    "-e",
+                    # The command is not run through a shell, expand $DISPLAY here
+                    f"DISPLAY={os.environ.get('DISPLAY', '')}",
+                    "-v",
+                    "/tmp/.X11-unix:/tmp/.X11-unix",
+                )
+            )
+        add(chain.from_iterable(("-v", v) for v in volumes or ()))
         if network:
-            cmd += [f"--network={network}"]
+            append(f"--network={network}")
         if mount_host_passwd:
-            cmd += [
-                "-v",
-                "/etc/group:/etc/group:ro",
-                "-v",
-                "/etc/passwd:/etc/passwd:ro",
-                "-v",
-                "/etc/shadow:/etc/shadow:ro",
-                "-u",
-                f"{uid}:{gid}",
-            ]
+            add(
+                (
+                    "-v",
+                    "/etc/group:/etc/group:ro",
+                    "-v",
+                    "/etc/passwd:/etc/passwd:ro",
+                    "-v",
+                    "/etc/shadow:/etc/shadow:ro",
+                    "-u",
+                    f"{uid}:{gid}",
+                )
+            )
 
             # Enable sudo only if we are mounting host password files
             if enable_sudo:
-                cmd += ["-v", "/etc/sudoers.d:/etc/sudoers.d:ro"]
+                add(("-v", "/etc/sudoers.d:/etc/sudoers.d:ro"))
 
-        cmd += [
-            "-e",
-            f"SRC_DIR={project_realpath}",
-        ]
-        if ports:
-            for port in ports:
-                cmd += ["-p", f"{port}:{port}"]
+        add(("-e", f"SRC_DIR={project_realpath}"))
+        add(chain.from_iterable(("-p", f"{port}:{port}") for port in ports or ()))
 
-        if prompt:
-            cmd += ["-t", "-i", "-e", "PROMPT=1"]
+        if prompt and not batch:
+            add(("-t", "-i", "-e", "PROMPT=1"))
 
-        cmd += self.get_docker_run_args()
+        add(self.get_docker_run_args())
         if mount_home:
-            cmd += [
-                "-v",
-                home_dir + ":" + home_dir,
-            ]
-        if envs:
-            for env in envs:
-                cmd += ["-e", env]
-        cmd += [
-            "-v",
-            f"{project_realpath}:{project_realpath}",
-            image_url,
-        ]
+            add(("-v", f"{home}:{home}"))
+        add(chain.from_iterable(("-e", env) for env in envs or ()))
+        add(("-v", f"{project_realpath}:{project_realpath}", image_url))
+
+        if batch:
+            # Keep the container alive, commands are started in it with docker exec
+            cmd.append("sleep infinity")
+            self._exec_cmd(cmd, quiet=True)
+            self._exec_in_container(container, project_realpath, prompt, cmds, envs)
+            return
 
         if cmds:
+            # A single argument, the image entrypoint runs it with bash -c "$@"
             cmd.append(" ".join(cmds))
 
         self._exec_cmd(cmd)
@@ -1,5 +1,9 @@
 import os
 from pathlib import Path
+import pickle
+import subprocess
+import sys
+import time
 from typing import Dict, Type
 
 import pytest
@@ -8,6 +12,13 @@ import docker_wrapper
 from docker_wrapper import docker_helpers
 
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path: Path, monkeypatch) -> Path:  # type: ignore
+    # keep the docker_wrapper caches of the tests away from the user's home
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
 @pytest.fixture
 def image_registry() -> Dict[str, Type[docker_helpers.DockerImage]]:
     # point to the sample_images directory
@@ -33,8 +44,288 @@ def test_image_prompt(image_registry, mocker) -> None:  # type: ignore
     assert image.tagged_name in run_args
 
 
+def test_versioned_image_is_not_hashed(image_registry, mocker) -> None:  # type: ignore
+    image = image_registry["ubuntu_base"]()
+    image.version = "1.2"
+    folder_hash = mocker.spy(docker_helpers, "_cached_image_hash")
+    fast_hash = mocker.spy(docker_helpers, "dockerfile_hash")
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    image.run("", prompt=True)
+    assert image.tagged_name == "ubuntu_base:1.2"
+    assert image.batch_container_name("").startswith("dw-ubuntu_base-1.2-")
+    assert folder_hash.call_count == 0
+    assert fast_hash.call_count == 0
+
+
+def test_built_versioned_image(image_registry, mocker) -> None:  # type: ignore
+    image = image_registry["ubuntu_base"]()
+    image.version = "1.2"
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    local_images = mocker.patch.object(docker_helpers, "_local_image_set", return_value=set())
+    image.build_image()
+    assert image._exec_cmd.call_count == 1
+    # A new build trusts the record of the previous one without asking docker
+    image = image_registry["ubuntu_base"]()
+    image.version = "1.2"
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    image.build_image()
+    assert image._exec_cmd.call_count == 0
+    assert local_images.call_count == 1
+    image.build_image(force_build=True)
+    assert image._exec_cmd.call_count == 1
+    # Running checks that the image is still there, and builds it if it was removed
+    image = image_registry["ubuntu_base"]()
+    image.version = "1.2"
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    image.run("", prompt=True)
+    assert local_images.call_count == 2
+    commands = [call.args[0][:2] for call in image._exec_cmd.call_args_list]
+    assert commands == [["docker", "build"], ["docker", "run"]]
+
+
+def test_image_exists_normalized_names(image_registry, mocker) -> None:  # type: ignore
+    assert docker_helpers._normalize_image_name("ubuntu") == "docker.io/library/ubuntu:latest"
+    assert docker_helpers._normalize_image_name("localhost:5000/base") == (
+        "localhost:5000/base:latest"
+    )
+    assert docker_helpers._normalize_image_name("ubuntu@sha256:abcd") is None
+    mocker.patch.object(docker_helpers, "_LOCAL_IMAGES", None)
+    listing = b"ubuntu:20.04\nquay.io/org/base:1.0\n<none>:<none>\n"
+    docker = mocker.patch(
+        "docker_wrapper.docker_helpers.subprocess.check_output", return_value=listing
+    )
+    inspect = mocker.patch("docker_wrapper.docker_helpers.subprocess.call", return_value=0)
+    image = image_registry["ubuntu_base"]()
+    assert image.image_exists("docker.io/library/ubuntu:20.04")
+    assert image.image_exists("quay.io/org/base:1.0")
+    # A missing image is answered from the listing, without a docker image inspect
+    assert not image.image_exists("ubuntu_base:1.2")
+    assert docker.call_count == 1
+    assert inspect.call_count == 0
+
+
 def test_derived_image_hash(image_registry) -> None:  # type: ignore
     assert "ubuntu_derived" in image_registry
     image = image_registry["ubuntu_derived"]()
     assert image.image_hash[:10] == "b50e8bc0f5"
     assert image.tagged_name == "ubuntu_derived:b50e8bc0f5"
+
+
+def test_derived_image_of_derived_image(tmp_path) -> None:  # type: ignore
+    # A deadlock holds the cached_property lock shared by all the instances of the class
+    # forever, so the image is hashed in a separate interpreter
+    test_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../sample-images")
+    code = (
+        "import pathlib, docker_wrapper\n"
+        f"derived = docker_wrapper.cli.find_extensions(pathlib.Path({test_path!r}))"
+        '["ubuntu_derived"]\n'
+        "class Leaf(derived):\n"
+        "    def __init__(self):\n"
+        "        super().__init__()\n"
+        "        self.parent = derived()\n"
+        "assert Leaf().image_hash != derived().image_hash\n"
+    )
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / "cache"))
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, timeout=60)
+
+
+def test_folder_hash_cache(tmp_path, mocker) -> None:  # type: ignore
+    docker_folder = tmp_path / "Docker"
+    docker_folder.mkdir()
+    dockerfile = docker_folder / "Dockerfile"
+    dockerfile.write_text("FROM ubuntu:20.04\n")
+    # Move the mtime out of the window where the folder is considered racy
+    os.utime(dockerfile, ns=(10**9, 10**9))
+    os.utime(docker_folder, ns=(10**9, 10**9))
+    dirhash = mocker.spy(docker_helpers, "_fast_dirhash")
+    first = docker_helpers.DockerImage.folder_hash(str(docker_folder))
+    assert docker_helpers.DockerImage.folder_hash(str(docker_folder)) == first
+    assert dirhash.call_count == 1
+
+    dockerfile.write_text("FROM ubuntu:22.04\n")
+    assert docker_helpers.DockerImage.folder_hash(str(docker_folder)) != first
+    assert dirhash.call_count == 2
+
+    # Same size, and mtime older than the newest entry of the folder
+    os.utime(dockerfile, ns=(10**9, 10**9))
+    os.utime(docker_folder, ns=(2 * 10**9, 2 * 10**9))
+    second = docker_helpers.DockerImage.folder_hash(str(docker_folder))
+    dockerfile.write_text("FROM ubuntu:24.04\n")
+    os.utime(dockerfile, ns=(10**9 + 1, 10**9 + 1))
+    assert docker_helpers.DockerImage.folder_hash(str(docker_folder)) != second
+
+    # Files linked from outside the folder are hashed by their contents
+    target = tmp_path / "entrypoint.sh"
+    target.write_text("#!/bin/bash\n")
+    link = docker_folder / "entrypoint.sh"
+    link.symlink_to(target)
+    os.utime(target, ns=(10**9, 10**9))
+    os.utime(link, ns=(10**9, 10**9), follow_symlinks=False)
+    os.utime(docker_folder, ns=(2 * 10**9, 2 * 10**9))
+    third = docker_helpers.DockerImage.folder_hash(str(docker_folder))
+    target.write_text("#!/bin/sh\n")
+    os.utime(target, ns=(10**9 + 2, 10**9 + 2))
+    assert docker_helpers.DockerImage.folder_hash(str(docker_folder)) != third
+    assert docker_helpers.DockerImage.folder_hash(
+        str(docker_folder)
+    ) == docker_helpers._fast_dirhash(str(docker_folder))
+
+
+def test_image_batch_run(image_registry, mocker) -> None:  # type: ignore
+    image = image_registry["ubuntu_base"]()
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    running = mocker.patch.object(docker_helpers, "_container_running", return_value=False)
+    image.run("", cmds=["ls"], batch=True)
+    container = image.batch_container_name("")
+    start_args = image._exec_cmd.call_args_list[-2].args[0]
+    assert start_args[:6] == ["docker", "run", "--rm", "--hostname=Docker", "-d", "--name"]
+    assert start_args[-1] == "sleep infinity"
+    assert image._exec_cmd.call_args.args[0][-4:] == [container, "bash", "-c", "ls"]
+
+    # Once the container runs, commands are only started inside it
+    running.return_value = True
+    image._exec_cmd.reset_mock()
+    image.run("", cmds=["ls"], batch=True)
+    image._exec_cmd.assert_called_once()
+    assert image._exec_cmd.call_args.args[0][:2] == ["docker", "exec"]
+
+
+def test_find_extensions_skips_non_image_folders(tmp_path) -> None:  # type: ignore
+    image = tmp_path / "img_a"
+    (image / "Docker").mkdir(parents=True)
+    (image / "docker_wrapper_extensions.py").write_text(
+        "import docker_wrapper\n\n\n"
+        "class ImgA(docker_wrapper.DockerImage):\n"
+        '    NAME = "img_a"\n'
+    )
+    # A Docker folder without an extensions file is not an image
+    (tmp_path / "no_ext" / "Docker").mkdir(parents=True)
+    # Image folders are direct children of the image folder, nested ones are never imported
+    nested = tmp_path / "group" / "img_b"
+    (nested / "Docker").mkdir(parents=True)
+    (nested / "docker_wrapper_extensions.py").write_text("raise RuntimeError()\n")
+    # Image folders may use any name
+    build = tmp_path / "build"
+    (build / "Docker").mkdir(parents=True)
+    (build / "docker_wrapper_extensions.py").write_text(
+        "import docker_wrapper\n\n\n"
+        "class Build(docker_wrapper.DockerImage):\n"
+        '    NAME = "build"\n'
+    )
+
+    ext = docker_wrapper.cli.find_extensions(tmp_path)
+    assert sorted(ext) == ["build", "img_a"]
+    # Each extensions module is registered under its own name
+    assert ext["img_a"].__module__ == "docker_wrapper_extensions_img_a"
+    assert sys.modules[ext["img_a"].__module__].ImgA is ext["img_a"]
+
+
+def test_pickle_extension_class(image_registry) -> None:  # type: ignore
+    image_class = image_registry["ubuntu_base"]
+    assert pickle.loads(pickle.dumps(image_class)) is image_class
+    image = pickle.loads(pickle.dumps(image_class()))
+    assert type(image) is image_class
+    assert image.tagged_name == "ubuntu_base:0d7a3669ae"
+
+
+def test_image_build_cache_from(image_registry, mocker) -> None:  # type: ignore
+    image = image_registry["ubuntu_base"](docker_registry_prefix="registry.example.com")
+    mocker.patch.object(image, "_exec_cmd", autospec=True)
+    mocker.patch.object(image, "image_exists", return_value=False)
+    pull = mocker.patch("docker_wrapper.docker_helpers.subprocess.call", return_value=1)
+    image.build_image()
+    latest_url = "registry.example.com/ubuntu_base:latest"
+    assert pull.call_args.args[0] == ["docker", "pull", latest_url]
+    build_args = image._exec_cmd.call_args.args[0]
+    assert build_args[build_args.index("--cache-from") + 1] == latest_url
+    assert build_args[-4:] == ["-t", image.image_url, "-t", latest_url]
+
+
+def test_dockerfile_hash(tmp_path) -> None:  # type: ignore
+    (tmp_path / "Dockerfile").write_text(
+        "FROM ubuntu:20.04\nCOPY --chown=root \\\n  ./entrypoint.sh /\nCOPY --from=build /a /b\n"
+    )
+    (tmp_path / "entrypoint.sh").write_text("#!/bin/bash\n")
+    digest = docker_helpers.dockerfile_hash(str(tmp_path))
+    assert digest is not None
+    # Files the Dockerfile does not use do not change the hash
+    (tmp_path / "notes.txt").write_text("unused")
+    assert docker_helpers.dockerfile_hash(str(tmp_path)) == digest
+    (tmp_path / "entrypoint.sh").write_text("#!/bin/sh\n")
+    assert docker_helpers.dockerfile_hash(str(tmp_path)) != digest
+    # Absolute sources are taken from the build context, not from the host
+    (tmp_path / "Dockerfile").write_text("FROM ubuntu:20.04\nCOPY /entrypoint.sh /\n")
+    assert docker_helpers._dockerfile_inputs(str(tmp_path)) == [
+        str(tmp_path / "Dockerfile"),
+        str(tmp_path / "entrypoint.sh"),
+    ]
+    # Sources outside of the build context fall back to the full folder hash
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "Dockerfile").write_text("FROM ubuntu:20.04\nCOPY ../notes.txt /\n")
+    assert docker_helpers.dockerfile_hash(str(tmp_path / "sub")) is None
+    # Remote sources can not be hashed locally
+    (tmp_path / "Dockerfile").write_text("FROM ubuntu:20.04\nADD https://example.com/x /\n")
+    assert docker_helpers.dockerfile_hash(str(tmp_path)) is None
+
+
+def test_extensions_index(mocker) -> None:  # type: ignore
+    test_path = Path(os.path.dirname(os.path.realpath(__file__))) / "../sample-images"
+    load = mocker.spy(docker_wrapper.cli, "_load_extensions_module")
+    scan = mocker.spy(docker_wrapper.cli, "_scan_extension_names")
+    first = docker_wrapper.cli._index_extensions(test_path)
+    assert scan.call_count == 2
+    # The second lookup is served from the index without parsing any file
+    second = docker_wrapper.cli._index_extensions(test_path)
+    assert scan.call_count == 2
+    assert second == first
+    assert set(first) == {"ubuntu_base", "ubuntu_derived"}
+    # Image names are found without importing the extension modules
+    assert load.call_count == 0
+
+
+def test_lookup_extensions_edited_file(tmp_path) -> None:  # type: ignore
+    image_dir = tmp_path / "images"
+    ext_path = image_dir / "img_d" / "docker_wrapper_extensions.py"
+    (ext_path.parent / "Docker").mkdir(parents=True)
+    source = "import docker_wrapper\n\n\nclass ImgD(docker_wrapper.DockerImage):\n"
+    ext_path.write_text(source + '    NAME = "img_d"\n')
+    os.utime(ext_path, ns=(10**9, 10**9))
+    assert list(docker_wrapper.cli._lookup_extensions(image_dir)) == ["img_d"]
+    # Editing an extensions file does not change the mtime of the image folder
+    ext_path.write_text(source + '    NAME = "img_e"\n')
+    os.utime(ext_path, ns=(2 * 10**9, 2 * 10**9))
+    assert list(docker_wrapper.cli._lookup_extensions(image_dir)) == ["img_e"]
+
+
+def test_scan_extension_names(tmp_path, mocker) -> None:  # type: ignore
+    ext_path = tmp_path / "img_c" / "docker_wrapper_extensions.py"
+    (ext_path.parent / "Docker").mkdir(parents=True)
+    ext_path.write_text(
+        "import docker_wrapper\n\n\n"
+        "class Base(docker_wrapper.DockerImage):\n"
+        "    pass\n\n\n"
+        "class ImgC(Base):\n"
+        '    NAME = "img_c"\n'
+    )
+    load = mocker.spy(docker_wrapper.cli, "_load_extensions_module")
+    assert docker_wrapper.cli._scan_extension_names(str(ext_path)) == ["img_c"]
+    assert load.call_count == 0
+    # A NAME in a class of an unknown base is only trusted after importing the file
+    ext_path.write_text(
+        ext_path.read_text() + "\n\nclass Mode(str):\n" + '    NAME = "not_an_image"\n'
+    )
+    names = docker_wrapper.cli._scan_extension_names(str(ext_path))
+    assert "img_c" in names and "not_an_image" not in names
+    assert load.call_count == 1
+
+
+def test_docker_login_is_fresh(mocker) -> None:  # type: ignore
+    prefix = "ECR-REGISTRY.amazonaws.com/myprefix-"
+    assert not docker_wrapper.cli._docker_login_is_fresh(prefix)
+    docker_wrapper.cli._record_docker_login(prefix)
+    assert docker_wrapper.cli._docker_login_is_fresh(prefix)
+    assert not docker_wrapper.cli._docker_login_is_fresh("other.registry.io/prefix-")
+    # Logins older than the token lifetime are done again
+    later = time.time() + docker_wrapper.cli._DOCKER_LOGIN_MAX_AGE + 1
+    mocker.patch("docker_wrapper.cli.time.time", return_value=later)
+    assert not docker_wrapper.cli._docker_login_is_fresh(prefix)